@@ -1,3 +1,4 @@
+import argparse
 import logging
 from logging.handlers import RotatingFileHandler
 from typing import Tuple, Dict, Optional
@@ -6,6 +7,7 @@ import os
 import colorama
 from colorama import Fore, Back, Style
 from pyfiglet import Figlet
+from scripts.profiling import ScriptProfiler
 
 # Initialize colorama
 colorama.init(autoreset=True)
@@ -109,7 +111,17 @@ def authenticate() -> Optional[Tuple]:
     print(Fore.RED + "Authentication failed. Please check your credentials.")
     return None
 
-def run_script(script_name: str, auth_info: Tuple):
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="SharePoint Recon & Deception Tool")
+    parser.add_argument('--profile', action='store_true',
+                        help="Run the selected script under cProfile and tracemalloc, writing reports to logs/")
+    parser.add_argument('--profile-sample', type=float, metavar='SECONDS',
+                        help="Also sample the wall-clock stack at this interval while profiling")
+    parser.add_argument('--profile-top', type=int, default=25, metavar='N',
+                        help="Number of entries in each section of the profile report (default: 25)")
+    return parser.parse_args()
+
+def run_script(script_name: str, auth_info: Tuple, args: Optional[argparse.Namespace] = None):
     try:
         print(Fore.CYAN + f"\nRunning...\n")
         module = __import__(f"scripts.{script_name[:-3]}", fromlist=['main'])
@@ -121,7 +133,16 @@ def run_script(script_name: str, auth_info: Tuple):
             if confirm.lower() != 'y':
                 print(Fore.RED + "Deployment cancelled" + Style.RESET_ALL)
                 return
-        module.main(auth_info)
+        if args is not None and args.profile:
+            profiler = ScriptProfiler(script_name[:-3], args.profile_sample, args.profile_top)
+            try:
+                with profiler:
+                    module.main(auth_info)
+            finally:
+                if profiler.report_path:
+                    print(Fore.CYAN + f"Profile report written to {profiler.report_path}" + Style.RESET_ALL)
+        else:
+            module.main(auth_info)
         #print(Fore.GREEN + f"{script_name} completed successfully.")
     except ImportError as e:
         logging.error(f"Failed to import script {script_name}: {e}")
@@ -131,6 +152,7 @@ def run_script(script_name: str, auth_info: Tuple):
         print(Fore.RED + f"Error running script {script_name}: {e}")
 
 def main():
+    args = parse_args()
     setup_logging()
     print_banner()
     
@@ -162,7 +184,7 @@ def main():
             print(Fore.YELLOW + "Exiting ShareSentry. Goodbye!")
             break
 
-        run_script(script, auth_info)
+        run_script(script, auth_info, args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiohttp
+from office365.runtime.http.request_options import RequestOptions
+from office365.sharepoint.client_context import ClientContext
+
+JSON_HEADERS = {
+    'Accept': 'application/json;odata=nometadata',
+    'Content-Type': 'application/json;odata=nometadata',
+}
+# Refresh the form digest a minute before SharePoint expires it
+DIGEST_MARGIN = 60
+
+class AsyncSearchClient:
+    """Asyncio client for the SharePoint /_api/search/postquery endpoint.
+
+    Requests are authenticated by the ClientContext's token provider and share
+    one pooled aiohttp session, so many pages can be in flight on one thread.
+    """
+
+    def __init__(
+        self,
+        ctx: ClientContext,
+        request_limit: float = 0.1,
+        max_concurrency: int = 100
+    ):
+        self.ctx = ctx
+        self.site_url = ctx.base_url.rstrip('/')
+        self.request_limit = request_limit
+        self.max_concurrency = max_concurrency
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._auth_lock = asyncio.Lock()
+        self._throttle_lock = asyncio.Lock()
+        self._next_request_time = 0.0
+        self._digest: Optional[str] = None
+        self._digest_expiry = 0.0
+
+    async def __aenter__(self) -> 'AsyncSearchClient':
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, ssl=False)
+        self._session = aiohttp.ClientSession(connector=connector)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _auth_headers(self, url: str) -> Dict[str, str]:
+        """Get auth headers from the office365 token provider without blocking the loop."""
+        request = RequestOptions(url)
+        async with self._auth_lock:
+            await asyncio.to_thread(self.ctx.authentication_context.authenticate_request, request)
+        return dict(request.headers)
+
+    async def _throttle_request(self):
+        """Space request starts by request_limit, matching the synchronous scanner."""
+        async with self._throttle_lock:
+            now = time.monotonic()
+            wait = self._next_request_time - now
+            self._next_request_time = max(now, self._next_request_time) + self.request_limit
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _get_digest(self) -> str:
+        """Fetch or reuse the form digest required for POST requests."""
+        if self._digest is None or time.monotonic() >= self._digest_expiry:
+            url = f"{self.site_url}/_api/contextinfo"
+            headers = {**JSON_HEADERS, **await self._auth_headers(url)}
+            async with self._session.post(url, headers=headers) as response:
+                response.raise_for_status()
+                info = await response.json(content_type=None)
+            self._digest = info['FormDigestValue']
+            self._digest_expiry = time.monotonic() + info.get('FormDigestTimeoutSeconds', 1800) - DIGEST_MARGIN
+        return self._digest
+
+    async def post_query(
+        self,
+        query_text: str,
+        start_row: int = 0,
+        row_limit: int = 500,
+        select_properties: Optional[List[str]] = None,
+        **request_fields
+    ) -> Dict:
+        """Run one postquery request and return the RelevantResults table."""
+        url = f"{self.site_url}/_api/search/postquery"
+        payload = {
+            'request': {
+                'Querytext': query_text,
+                'StartRow': start_row,
+                'RowLimit': row_limit,
+                'TrimDuplicates': False,
+                'SelectProperties': select_properties or ['Path'],
+                **request_fields,
+            }
+        }
+        async with self._semaphore:
+            await self._throttle_request()
+            headers = {**JSON_HEADERS, **await self._auth_headers(url), 'X-RequestDigest': await self._get_digest()}
+            async with self._session.post(url, json=payload, headers=headers) as response:
+                response.raise_for_status()
+                result = await response.json(content_type=None)
+        return result['PrimaryQueryResult']['RelevantResults']
+
+    async def search(
+        self,
+        query_text: str,
+        row_limit: int = 500,
+        max_rows: Optional[int] = None,
+        select_properties: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, str]]:
+        """Yield result rows as {property: value} dicts, fetching pages concurrently.
+
+        The first page reports TotalRows; every remaining page is then requested
+        at once and rows are yielded in completion order.
+        """
+        first = await self.post_query(query_text, 0, row_limit, select_properties)
+        for row in _parse_rows(first):
+            yield row
+
+        total_rows = first.get('TotalRows') or 0
+        if max_rows is not None:
+            total_rows = min(total_rows, max_rows)
+        pages = [
+            asyncio.ensure_future(self.post_query(query_text, start_row, row_limit, select_properties))
+            for start_row in range(row_limit, total_rows, row_limit)
+        ]
+        try:
+            for page in asyncio.as_completed(pages):
+                try:
+                    results = await page
+                except Exception as e:
+                    logging.error(f"Error during async search page: {e}")
+                    continue
+                for row in _parse_rows(results):
+                    yield row
+        finally:
+            for page in pages:
+                page.cancel()
+
+def _parse_rows(results: Dict) -> List[Dict[str, str]]:
+    """Flatten postquery Cells into one dict per row."""
+    return [
+        {cell['Key']: cell['Value'] for cell in row['Cells']}
+        for row in results['Table']['Rows']
+    ]
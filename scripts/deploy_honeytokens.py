@@ -1,7 +1,9 @@
 import json
 import urllib3, os
+import mmap
 import random
 import logging
+import uuid
 from datetime import datetime, timedelta
 from office365.runtime.auth.user_credential import UserCredential
 from office365.sharepoint.client_context import ClientContext
@@ -10,14 +12,95 @@ from office365.runtime.client_request_exception import ClientRequestException
 from random import choice
 from tqdm import tqdm
 from colorama import Fore, Style, init
+from scripts.work_queue import WorkQueue, default_run_id
 
 init(autoreset=True)  # Initialize colorama
 
 urllib3.disable_warnings()
 
+# Templates above this size are sent through a chunked upload session
+CHUNKED_UPLOAD_THRESHOLD = 10 * 1024 * 1024  # 10 MB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+# Templates may embed this placeholder, it is replaced by a unique marker per deployment
+MARKER_PLACEHOLDER = b'SHARESENTRY-DECOY-MARKER-XXXXXXX'
+# Lease per site in distributed mode, long enough for a chunked upload
+DEPLOY_LEASE_SECONDS = 1800
+
 def disable_ssl(request):
     request.verify = False  # Disable certification verification
 
+def new_marker():
+    return uuid.uuid4().hex.encode()[:len(MARKER_PLACEHOLDER)]
+
+def find_marker_offsets(content):
+    offsets = []
+    offset = content.find(MARKER_PLACEHOLDER)
+    while offset != -1:
+        offsets.append(offset)
+        offset = content.find(MARKER_PLACEHOLDER, offset + len(MARKER_PLACEHOLDER))
+    return offsets
+
+def patch_chunk(chunk, chunk_offset, marker_offsets, marker):
+    """Return the chunk with any overlapping markers patched in, copying only if needed."""
+    chunk_end = chunk_offset + len(chunk)
+    overlapping = [m for m in marker_offsets if m < chunk_end and m + len(marker) > chunk_offset]
+    if not overlapping:
+        return chunk
+    patched = bytearray(chunk)
+    for m in overlapping:
+        start, end = max(m, chunk_offset), min(m + len(marker), chunk_end)
+        patched[start - chunk_offset:end - chunk_offset] = marker[start - m:end - m]
+    return patched
+
+def upload_large_template(ctx, folder, file_name, template_path, marker, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Upload a template through a chunked upload session, reading zero-copy mmap slices."""
+    upload_id = str(uuid.uuid4())
+    target_file = folder.files.add(file_name, None, True)
+    ctx.execute_query()
+    with open(template_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        marker_offsets = find_marker_offsets(mm)
+        file_size = len(mm)
+        offset = 0
+        try:
+            with memoryview(mm) as view:
+                while offset < file_size:
+                    end = min(offset + chunk_size, file_size)
+                    with view[offset:end] as chunk:
+                        content = patch_chunk(chunk, offset, marker_offsets, marker)
+                        if offset == 0:
+                            target_file.start_upload(upload_id, content)
+                        elif end < file_size:
+                            target_file.continue_upload(upload_id, offset, content)
+                        else:
+                            target_file.finish_upload(upload_id, offset, content)
+                        ctx.execute_query()
+                    offset = end
+        except Exception:
+            try:
+                target_file.cancel_upload(upload_id).execute_query()
+            except Exception as e:
+                logging.error(f"Error cancelling upload session for {file_name}: {e}")
+            # Cancelling only removes files created by StartUpload, not the empty file added above
+            try:
+                target_file.delete_object().execute_query()
+            except Exception as e:
+                logging.error(f"Error deleting partially uploaded {file_name}: {e}")
+            raise
+    return target_file, bool(marker_offsets)
+
+def upload_template(ctx, folder, file_name, template_path, marker):
+    """Upload a template with its marker patched in, returning whether a marker was embedded."""
+    if os.path.getsize(template_path) > CHUNKED_UPLOAD_THRESHOLD:
+        _, has_marker = upload_large_template(ctx, folder, file_name, template_path, marker)
+        return has_marker
+    with open(template_path, 'rb') as file_content:
+        file_content_bytes = file_content.read()
+    has_marker = MARKER_PLACEHOLDER in file_content_bytes
+    if has_marker:
+        file_content_bytes = file_content_bytes.replace(MARKER_PLACEHOLDER, marker)
+    folder.upload_file(file_name, file_content_bytes).execute_query()
+    return has_marker
+
 def get_random_filename(template_name):
     if template_name.endswith('.vault'):
         ext_list = ['vault', 'kdbx', 'kdb', 'kpdx', 'mscx', 'msim', 'dash', '1PUX']
@@ -114,76 +197,121 @@ def write_to_output_file(file_path, content):
     with open(file_path, 'a') as f:
         f.write(content + '\n')
 
-def deploy_honeytokens(auth_info, templates_folder, writable_spaces):
-    output_file = 'output/deployed_tokens.txt'
-    logging.info("Starting deployment of decoys")
-    for space in tqdm(writable_spaces, desc="Deploying honeytokens", unit="site"):
-        print(f"\n{Fore.CYAN}Attempting to deploy honeytoken to {space}{Style.RESET_ALL}")
-        if auth_info[0] == 'user_pass':
-            _, username, password, _ = auth_info
-            ctx = ClientContext(space).with_credentials(UserCredential(username, password))
-        else:  # Azure app auth
-            _, cert_settings, tenant, _ = auth_info
-            ctx = ClientContext(space).with_client_certificate(tenant, **cert_settings)
+def deploy_to_space(auth_info, templates_folder, space, output_file):
+    """Deploy one honeytoken to a space.
+
+    Returns 'deployed', 'metadata failed' if the decoy was uploaded and recorded
+    but its metadata could not be updated, or None if nothing was uploaded.
+    """
+    print(f"\n{Fore.CYAN}Attempting to deploy honeytoken to {space}{Style.RESET_ALL}")
+    if auth_info[0] == 'user_pass':
+        _, username, password, _ = auth_info
+        ctx = ClientContext(space).with_credentials(UserCredential(username, password))
+    else:  # Azure app auth
+        _, cert_settings, tenant, _ = auth_info
+        ctx = ClientContext(space).with_client_certificate(tenant, **cert_settings)
+
+    ctx.pending_request().beforeExecute += disable_ssl
 
-        ctx.pending_request().beforeExecute += disable_ssl
+    try:
+        default_lib = ctx.web.default_document_library().get().execute_query()
+        print(f"{Fore.WHITE}Found default document library: {default_lib.properties['Title']}{Style.RESET_ALL}")
+    except ClientRequestException as e:
+        logging.error(f"Error accessing default document library: {e}")
+        print(f"{Fore.RED}Error accessing default document library: {e}{Style.RESET_ALL}")
+        return None
 
+    site_owner = get_site_owner(ctx)
+    if not site_owner:
+        print(f"{Fore.RED}Couldn't get site owner for {space}. Skipping...{Style.RESET_ALL}")
+        return None
+    
+    # Choose one random template file
+    templates = [t for t in os.listdir(templates_folder) if t.startswith('template')]
+    if not templates:
+        print(f"{Fore.RED}No template files found in {templates_folder}. Skipping...{Style.RESET_ALL}")
+        return None
+    
+    template = random.choice(templates)
+    random_filename = get_random_filename(template)
+    if random_filename:
+        template_path = os.path.join(templates_folder, template)
+        marker = new_marker()
         try:
-            default_lib = ctx.web.default_document_library().get().execute_query()
-            print(f"{Fore.WHITE}Found default document library: {default_lib.properties['Title']}{Style.RESET_ALL}")
+            root_folder = ctx.web.default_document_library().root_folder
+            has_marker = upload_template(ctx, root_folder, random_filename, template_path, marker)
         except ClientRequestException as e:
-            logging.error(f"Error accessing default document library: {e}")
-            print(f"{Fore.RED}Error accessing default document library: {e}{Style.RESET_ALL}")
-            continue
-
-        site_owner = get_site_owner(ctx)
-        if not site_owner:
-            print(f"{Fore.RED}Couldn't get site owner for {space}. Skipping...{Style.RESET_ALL}")
-            continue
-        
-        # Choose one random template file
-        templates = [t for t in os.listdir(templates_folder) if t.startswith('template')]
-        if not templates:
-            print(f"{Fore.RED}No template files found in {templates_folder}. Skipping...{Style.RESET_ALL}")
-            continue
-        
-        template = random.choice(templates)
-        random_filename = get_random_filename(template)
-        if random_filename:
-            template_path = os.path.join(templates_folder, template)
-            try:
-                with open(template_path, 'rb') as file_content:
-                    file_content_bytes = file_content.read()
-                    uploaded_file = ctx.web.default_document_library().root_folder.upload_file(random_filename, file_content_bytes).execute_query()
-                print(f"{Fore.GREEN}Deployed honeytoken {random_filename} to {space}{Style.RESET_ALL}")
-
-                # Generate new dates
-                current_time = datetime.utcnow()
-                start_date = current_time - timedelta(days=365*3)  # 3 years ago
-                end_date = current_time - timedelta(days=30)  # 1 month ago
-
-                new_created_date = generate_random_datetime(start_date, end_date)
-                new_modified_date = generate_random_datetime(new_created_date, current_time)
-
-                # Update file metadata
-                update_success = update_file_metadata(ctx, default_lib.properties['Title'], random_filename, site_owner, new_created_date, new_modified_date)
-                if update_success:
-                    print(f"{Fore.WHITE}Attempting to Update metadata for {random_filename}{Style.RESET_ALL}")
-                    # Write to output file
-                    write_to_output_file(output_file, f"{space}/{random_filename}")
-                else:
-                    print(f"{Fore.RED}Failed to update metadata for {random_filename}{Style.RESET_ALL}")
-            except ClientRequestException as e:
-                print(f"{Fore.RED}Error uploading {random_filename} to {space}: {e}{Style.RESET_ALL}")
-                print(f"{Fore.RED}Response content: {e.response.content if e.response else 'No response content'}{Style.RESET_ALL}")
-                continue
+            print(f"{Fore.RED}Error uploading {random_filename} to {space}: {e}{Style.RESET_ALL}")
+            print(f"{Fore.RED}Response content: {e.response.content if e.response else 'No response content'}{Style.RESET_ALL}")
+            return None
+        print(f"{Fore.GREEN}Deployed honeytoken {random_filename} to {space}{Style.RESET_ALL}")
+
+        # Generate new dates
+        current_time = datetime.utcnow()
+        start_date = current_time - timedelta(days=365*3)  # 3 years ago
+        end_date = current_time - timedelta(days=30)  # 1 month ago
+
+        new_created_date = generate_random_datetime(start_date, end_date)
+        new_modified_date = generate_random_datetime(new_created_date, current_time)
+
+        # Update file metadata
+        update_success = update_file_metadata(ctx, default_lib.properties['Title'], random_filename, site_owner, new_created_date, new_modified_date)
+        if update_success:
+            print(f"{Fore.WHITE}Attempting to Update metadata for {random_filename}{Style.RESET_ALL}")
+        else:
+            print(f"{Fore.RED}Failed to update metadata for {random_filename}{Style.RESET_ALL}")
+
+        # Write to output file, the decoy is on the site whether or not its metadata was updated
+        entry = f"{space}/{random_filename}"
+        if has_marker:
+            entry += f"\tmarker={marker.decode()}"
+        if not update_success:
+            entry += "\tmetadata=failed"
+        write_to_output_file(output_file, entry)
+        return 'deployed' if update_success else 'metadata failed'
+    return None
+
+def deploy_honeytokens(auth_info, templates_folder, writable_spaces, queue=None):
+    output_file = 'output/deployed_tokens.txt'
+    logging.info("Starting deployment of decoys")
+    if queue is None:
+        for space in tqdm(writable_spaces, desc="Deploying honeytokens", unit="site"):
+            deploy_to_space(auth_info, templates_folder, space, output_file)
+        return
+
+    # Share the spaces with other workers through the leased queue
+    queue.enqueue(space for space in writable_spaces if space)
+    with tqdm(desc="Deploying honeytokens", unit="site") as pbar:
+        for item_id, space in queue:
+            result = deploy_to_space(auth_info, templates_folder, space, output_file)
+            if result:
+                # A decoy is on the site, retrying would only upload another one
+                queue.complete(item_id, result)
+            else:
+                # Released for another attempt, or marked failed after MAX_ATTEMPTS
+                queue.fail(item_id, 'not deployed')
+            pbar.update(1)
 
 def main(auth_info):
     templates_folder = 'templates'
     with open('output/writable_spaces.txt', 'r') as f:
         writable_spaces = [line.strip() for line in f]
 
-    deploy_honeytokens(auth_info, templates_folder, writable_spaces)
+    queue_path = input("Enter shared work queue path to split work with other workers (or press Enter to run on this host only): ").strip()
+    queue = None
+    if queue_path:
+        run_id = input(f"Enter the run id shared by all workers of this run (default {default_run_id()}): ").strip() or default_run_id()
+        queue = WorkQueue(queue_path, 'deploy_honeytokens', DEPLOY_LEASE_SECONDS, run_id)
+        if queue.drained():
+            print(f"\n{Fore.YELLOW}Run {run_id} on {queue_path} has already finished ({queue.counts()}). Enter a new run id to start another run.{Style.RESET_ALL}")
+            queue.close()
+            return
+    try:
+        deploy_honeytokens(auth_info, templates_folder, writable_spaces, queue)
+    finally:
+        if queue is not None:
+            logging.info(f"Work queue {queue_path} status: {queue.counts()}")
+            queue.close()
     print(f"\n{Fore.YELLOW}Deployment complete. Output written to 'output/deployed_tokens.txt'{Style.RESET_ALL}")
     logging.info("Deployment complete. Output written to deployed_tokens.txt")
 
@@ -1,11 +1,12 @@
 import urllib3
 from office365.runtime.auth.user_credential import UserCredential
 from office365.sharepoint.client_context import ClientContext
-from typing import List, Tuple
+from typing import Iterable, Tuple
 import logging
 from tqdm import tqdm
 from colorama import Fore, Style, init
 import os
+from scripts.url_store import UrlStore
 
 init(autoreset=True)
 
@@ -23,9 +24,9 @@ def print_banner():
 def disable_ssl(request):
     request.verify = False
 
-def get_all_sites_new(ctx: ClientContext, row_limit: int = 500) -> List[str]:
+def get_all_sites_new(ctx: ClientContext, row_limit: int = 500) -> UrlStore:
     # row limit can be incraesed to 1000
-    sites = set()
+    sites = UrlStore()
     start_row = 0 
     more_results = True
     logging.info("Starting SharePoint site enumeration.")
@@ -42,7 +43,7 @@ def get_all_sites_new(ctx: ClientContext, row_limit: int = 500) -> List[str]:
             else:
                 more_results = False
     
-    return list(sites)
+    return sites
 
 def authenticate(auth_info: Tuple) -> ClientContext:
     auth_method, *auth_details = auth_info
@@ -56,7 +57,7 @@ def authenticate(auth_info: Tuple) -> ClientContext:
     ctx.pending_request().beforeExecute += disable_ssl
     return ctx
 
-def save_sites(sites: List[str], filename: str):
+def save_sites(sites: Iterable[str], filename: str):
     os.makedirs(os.path.dirname(filename), exist_ok=True)
     with open(filename, 'w', encoding='utf-8') as f:
         for site in sites:
@@ -5,6 +5,7 @@ from tqdm import tqdm
 from typing import Tuple
 from office365.runtime.auth.user_credential import UserCredential
 from office365.sharepoint.client_context import ClientContext
+from scripts.work_queue import WorkQueue, default_run_id
 
 urllib3.disable_warnings()
 
@@ -80,17 +81,41 @@ def main(auth_info: Tuple):
         print(f"{Fore.RED}Error reading {input_file}: {e}{Style.RESET_ALL}")
         return
     
+    queue_path = input("Enter shared work queue path to split work with other workers (or press Enter to run on this host only): ").strip()
+
     writable_count = 0
-    with tqdm(total=len(sites), desc="Testing write permission", ncols=100, unit="site") as pbar:
-        for site_url in sites:
-            if test_write_permission(site_url, auth_info):
-                with open(output_file, 'a', encoding='utf-8') as f:
-                    f.write(f"{site_url}\n")
-                writable_count += 1
-            pbar.update(1)
+    if queue_path:
+        run_id = input(f"Enter the run id shared by all workers of this run (default {default_run_id()}): ").strip() or default_run_id()
+        queue = WorkQueue(queue_path, 'writable_spaces', run_id=run_id)
+        if queue.drained():
+            print(f"\n{Fore.YELLOW}Run {run_id} on {queue_path} has already finished ({queue.counts()}). Enter a new run id to start another run.{Style.RESET_ALL}")
+            queue.close()
+            return
+        queue.enqueue(site for site in sites if site)
+        with tqdm(desc="Testing write permission", ncols=100, unit="site") as pbar:
+            for item_id, site_url in queue:
+                writable = test_write_permission(site_url, auth_info)
+                if writable:
+                    with open(output_file, 'a', encoding='utf-8') as f:
+                        f.write(f"{site_url}\n")
+                    writable_count += 1
+                queue.complete(item_id, 'writable' if writable else 'not writable')
+                pbar.update(1)
+            tested_count = pbar.n
+        logging.info(f"Work queue {queue_path} status: {queue.counts()}")
+        queue.close()
+    else:
+        with tqdm(total=len(sites), desc="Testing write permission", ncols=100, unit="site") as pbar:
+            for site_url in sites:
+                if test_write_permission(site_url, auth_info):
+                    with open(output_file, 'a', encoding='utf-8') as f:
+                        f.write(f"{site_url}\n")
+                    writable_count += 1
+                pbar.update(1)
+        tested_count = len(sites)
     
-    logging.info(f"Found {writable_count} writable spaces out of {len(sites)} sites.")
-    print(f"\n{Fore.LIGHTGREEN_EX}Found {writable_count} writable spaces out of {len(sites)} sites.{Style.RESET_ALL}")
+    logging.info(f"Found {writable_count} writable spaces out of {tested_count} sites.")
+    print(f"\n{Fore.LIGHTGREEN_EX}Found {writable_count} writable spaces out of {tested_count} sites.{Style.RESET_ALL}")
     print(f"{Fore.LIGHTGREEN_EX}Writable spaces saved to {output_file}{Style.RESET_ALL}")
 
 if __name__ == "__main__":
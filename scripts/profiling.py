@@ -0,0 +1,174 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Functions whose cumulative time is attributed to each stage, as (file, function) patterns
+STAGES: Dict[str, List[Tuple[str, str]]] = {
+    'auth': [(r'office365/runtime/auth/', r'.*')],
+    'search paging': [
+        (r'scripts/scan_sharepoint\.py$', r'^(_iter_search_pages|count_rows)$'),
+        (r'scripts/identify_sites\.py$', r'^get_all_sites_new$'),
+        (r'scripts/async_search\.py$', r'^post_query$'),
+    ],
+    'json parsing': [(r'json/__init__\.py$', r'^loads$'), (r'json/decoder\.py$', r'^decode$')],
+    'file writes': [
+        (r'scripts/', r'^(save_results|save_sites|write_to_output_file)$'),
+        (r'^~$', r"^<method 'write' of '_io\."),
+    ],
+    'throttle sleep': [(r'scripts/', r'^_throttle_request$')],
+}
+
+class ScriptProfiler:
+    """Run a block under cProfile and tracemalloc, with optional wall-clock sampling.
+
+    Threads started inside the block (e.g. search worker pools) get their own
+    profiler, merged with the main thread's for the report. On exit a pstats
+    file and a text report with a per-stage breakdown, the top functions,
+    allocation sites and sampled stacks of all threads are written to output_dir.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        sample_interval: Optional[float] = None,
+        top_n: int = 25,
+        output_dir: str = 'logs'
+    ):
+        self.name = name
+        self.sample_interval = sample_interval
+        self.top_n = top_n
+        self.output_dir = output_dir
+        self.profiler = cProfile.Profile()
+        self.thread_profilers: List[cProfile.Profile] = []
+        self._profilers_lock = threading.Lock()
+        self.samples: Counter = Counter()
+        self.report_path: Optional[str] = None
+        self._stop_sampling = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._start_time = 0.0
+
+    def __enter__(self) -> 'ScriptProfiler':
+        tracemalloc.start()
+        if self.sample_interval:
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+        self._start_time = time.perf_counter()
+        threading.setprofile(self._profile_thread)
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        threading.setprofile(None)
+        elapsed = time.perf_counter() - self._start_time
+        self._stop_sampling.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        try:
+            self._write_report(elapsed, snapshot, peak)
+        except Exception as e:
+            logging.error(f"Error writing profile report for {self.name}: {e}")
+        return False
+
+    def _profile_thread(self, frame, event, arg):
+        """Start a profiler on each new thread, installed through threading.setprofile."""
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Interpreters where cProfile is process-wide already cover this thread
+            return
+        with self._profilers_lock:
+            self.thread_profilers.append(profiler)
+
+    def _sample(self):
+        """Record the innermost frames of every other thread each sample_interval."""
+        sampler_id = threading.get_ident()
+        while not self._stop_sampling.wait(self.sample_interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < 3:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[' <- '.join(stack)] += 1
+
+    def stats(self) -> pstats.Stats:
+        """Main thread stats merged with those of every profiled worker thread."""
+        stats = pstats.Stats(self.profiler)
+        with self._profilers_lock:
+            for profiler in self.thread_profilers:
+                stats.add(profiler)
+        return stats
+
+    def stage_times(self, stats: Optional[pstats.Stats] = None) -> Dict[str, float]:
+        """Sum the cumulative time of each stage's outermost matching functions."""
+        stats = (stats or self.stats()).stats
+        times = {}
+        for stage, patterns in STAGES.items():
+            def matches(func):
+                filename, _, function = func
+                filename = filename.replace('\\', '/')
+                return any(re.search(f, filename) and re.search(n, function) for f, n in patterns)
+
+            total = 0.0
+            for func, (_, _, _, cumulative, callers) in stats.items():
+                # Skip nested calls so time is only counted once per stage
+                if matches(func) and not any(matches(caller) for caller in callers):
+                    total += cumulative
+            times[stage] = total
+        return times
+
+    def _write_report(self, elapsed: float, snapshot: tracemalloc.Snapshot, peak: int):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile_{self.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        stats = self.stats()
+        stats.dump_stats(f"{base}.pstats")
+
+        report = io.StringIO()
+        report.write(f"Profile of {self.name}: {elapsed:.2f}s wall time, {peak / 1024 / 1024:.1f} MiB peak traced memory\n\n")
+
+        report.write("Time by stage (cumulative seconds summed over threads, % of wall time can exceed 100)\n")
+        report.write("-" * 80 + "\n")
+        for stage, seconds in self.stage_times(stats).items():
+            share = seconds / elapsed * 100 if elapsed else 0
+            report.write(f"{stage:<20} {seconds:>10.2f}s {share:>6.1f}%\n")
+
+        report.write(f"\nTop {self.top_n} functions by cumulative time\n")
+        report.write("-" * 80 + "\n")
+        stats.stream = report
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+
+        report.write(f"Top {self.top_n} allocation sites\n")
+        report.write("-" * 80 + "\n")
+        for stat in snapshot.statistics('lineno')[:self.top_n]:
+            report.write(f"{stat}\n")
+
+        if self.samples:
+            total = sum(self.samples.values())
+            report.write(f"\nTop {self.top_n} wall-clock samples ({total} samples every {self.sample_interval}s)\n")
+            report.write("-" * 80 + "\n")
+            for stack, count in self.samples.most_common(self.top_n):
+                report.write(f"{count / total * 100:>6.1f}%  {stack}\n")
+
+        self.report_path = f"{base}.txt"
+        with open(self.report_path, 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+        logging.info(f"Profile for {self.name} written to {base}.pstats and {self.report_path}")
@@ -1,18 +1,28 @@
 import urllib3
 from office365.runtime.auth.user_credential import UserCredential
 from office365.sharepoint.client_context import ClientContext
-from typing import List, Set, Tuple, Optional, Dict
-from datetime import datetime
+from typing import List, Tuple, Optional, Dict, Callable, Iterator, Iterable, AsyncIterator
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from contextlib import nullcontext, contextmanager
+from datetime import datetime, date, timedelta
 import logging
 from tqdm import tqdm
 import os
 import time
+import csv
 import json
+import re
+import threading
+from queue import Queue, Empty
 from rich.console import Console
 from rich.prompt import Prompt
 from rich.panel import Panel
+from rich.table import Table
 from rich import print as rprint
 from pathlib import Path
+from scripts.url_store import UrlStore
+from scripts.async_search import AsyncSearchClient
+from scripts.work_queue import WorkQueue, POLL_INTERVAL, default_run_id
 
 # Configure urllib3
 urllib3.disable_warnings()
@@ -20,27 +30,263 @@ urllib3.disable_warnings()
 # Initialize Rich console
 console = Console()
 
+# SharePoint search limits for a single KQL query
+KQL_MAX_LENGTH = 4096  # Default MaxKeywordQueryTextLength
+KQL_MAX_TERMS = 500
+SEARCH_WORKERS = 4
+# Rows reachable by StartRow paging before the search service stops returning results
+SEARCH_PAGING_CAP = 50000
+# Bounded range bisected when a partitioned query has no date filter, with open-ended windows either side
+PARTITION_START = date(2000, 1, 1)
+# Step used to split an open-ended window that still exceeds the paging cap
+OPEN_WINDOW_SPAN = timedelta(days=3650)
+# TotalRows is approximate for large result sets, window sums within this share of it are expected
+TOTAL_ROWS_TOLERANCE = 0.05
+# Refiners used by the exposure summary, LastModifiedTime is bucketed per year
+SUMMARY_REFINERS = ['SPSiteURL', 'FileExtension', 'LastModifiedTime']
+# Refinement entries requested per refiner, SharePoint returns far fewer by default
+SUMMARY_MAX_ENTRIES = 1000
+SUMMARY_YEARS = 10
+# Cost history used to schedule predefined queries across runs
+COST_HISTORY_FILE = 'output/query_costs.json'
+DEFAULT_SECONDS_PER_PAGE = 1.0
+# Lease per predefined query in distributed mode
+SEARCH_LEASE_SECONDS = 2 * 3600
+
+def create_context(auth_info: Tuple) -> ClientContext:
+    """Create an authenticated ClientContext from auth info."""
+    auth_type = auth_info[0]
+    if auth_type == 'user_pass':
+        _, username, password, url = auth_info
+        return ClientContext(url).with_credentials(UserCredential(username, password))
+    # Azure app auth
+    _, cert_settings, tenant, url = auth_info
+    return ClientContext(url).with_client_certificate(tenant, **cert_settings)
+
+def build_search_query(
+    query: str,
+    extensions: Optional[List[str]] = None,
+    last_modified: Optional[str] = None
+) -> str:
+    """Append file extension and date filters to a KQL query."""
+    search_query = query
+    if extensions:
+        search_query += f" AND ({' OR '.join([f'FileExtension:{ext}' for ext in extensions])})"
+    if last_modified:
+        search_query += f" AND {last_modified}"
+    return search_query
+
+def plan_keyword_queries(
+    keywords: List[str],
+    extensions: Optional[List[str]] = None,
+    last_modified: Optional[str] = None,
+    max_length: int = KQL_MAX_LENGTH,
+    max_terms: int = KQL_MAX_TERMS
+) -> List[str]:
+    """Split keywords into the fewest OR-queries that fit SharePoint's KQL limits.
+
+    Each planned query carries the extension and date filters, so the union of
+    their results matches a single query over all keywords.
+    """
+    filter_terms = len(extensions) if extensions else 0
+    if last_modified:
+        # Each property restriction is a term, e.g. a date range is two
+        filter_terms += max(len(re.findall(r'\w+\s*(?:>=|<=|<>|=|<|>|:)', last_modified)), 1)
+    term_budget = max_terms - filter_terms
+    # Length left for the keyword group once parentheses and filters are added
+    length_budget = len(build_search_query("()", extensions, last_modified))
+    length_budget = max_length - length_budget
+    if term_budget < 1 or length_budget < 1:
+        raise ValueError("File extension and date filters alone exceed the KQL query limits")
+
+    queries = []
+    chunk: List[str] = []
+    chunk_length = 0
+    for keyword in keywords:
+        term = f'"{keyword}"'
+        if len(term) > length_budget:
+            logging.warning(f"Skipping keyword longer than the KQL query limit: {keyword[:50]}")
+            continue
+        added_length = len(term) + (len(" OR ") if chunk else 0)
+        if chunk and (chunk_length + added_length > length_budget or len(chunk) >= term_budget):
+            queries.append(build_search_query(f"({' OR '.join(chunk)})", extensions, last_modified))
+            chunk, chunk_length = [], 0
+            added_length = len(term)
+        chunk.append(term)
+        chunk_length += added_length
+    if chunk:
+        queries.append(build_search_query(f"({' OR '.join(chunk)})", extensions, last_modified))
+
+    logging.info(f"Planned {len(queries)} KQL queries for {len(keywords)} keywords")
+    return queries
+
+# A LastModifiedTime window [start, end), None meaning unbounded on that side
+DateWindow = Tuple[Optional[date], Optional[date]]
+
+def get_partition_range(query: str, last_modified: Optional[str] = None) -> DateWindow:
+    """Return the [start, end) date range covered by a query's LastModifiedTime filter.
+
+    A side without a bound is None, so partitioning never drops files outside it.
+    """
+    text = f"{query} {last_modified or ''}"
+    bounds = dict(re.findall(r'LastModifiedTime(>=|<=)(\d{4}-\d{2}-\d{2})', text))
+    if bounds:
+        start = datetime.strptime(bounds['>='], '%Y-%m-%d').date() if '>=' in bounds else None
+        end = None
+        if '<=' in bounds:
+            end = datetime.strptime(bounds['<='], '%Y-%m-%d').date() + timedelta(days=1)
+        return start, end
+    if re.search(r'LastModifiedTime\s*=\s*"this year"', text, re.IGNORECASE):
+        return date(date.today().year, 1, 1), None
+    return None, None
+
+def date_window_clause(start: Optional[date], end: Optional[date]) -> str:
+    """KQL clause matching files modified in the half-open window [start, end)."""
+    clauses = []
+    if start is not None:
+        clauses.append(f"LastModifiedTime>={start.isoformat()}")
+    if end is not None:
+        clauses.append(f"LastModifiedTime<{end.isoformat()}")
+    return " AND ".join(clauses)
+
+def window_query(search_query: str, window: DateWindow) -> str:
+    """Restrict a search query to a date window."""
+    clause = date_window_clause(*window)
+    return f"{search_query} AND {clause}" if clause else search_query
+
+def split_window(window: DateWindow) -> Optional[List[DateWindow]]:
+    """Split a window in two, or return None if it is a single day."""
+    start, end = window
+    if start is None:
+        middle = end - OPEN_WINDOW_SPAN
+    elif end is None:
+        middle = start + OPEN_WINDOW_SPAN
+    else:
+        days = (end - start).days
+        if days <= 1:
+            return None
+        middle = start + timedelta(days=days // 2)
+    return [(start, middle), (middle, end)]
+
+def year_refiner(years: int = SUMMARY_YEARS) -> str:
+    """LastModifiedTime refiner with one bucket per year for the last `years` years."""
+    current_year = date.today().year
+    bounds = '/'.join(f"{year}-01-01" for year in range(current_year - years + 1, current_year + 2))
+    return f"LastModifiedTime(discretize=manual/{bounds})"
+
+def refinement_label(refiner: str, entry) -> str:
+    """Readable label for a refinement entry, years for LastModifiedTime ranges."""
+    if refiner == 'LastModifiedTime':
+        match = re.match(r'range\((\w+)[^,]*,\s*(\w+)', entry.RefinementToken or '')
+        if match:
+            start, end = match.groups()
+            if start == 'min':
+                return f"before {end[:4]}"
+            return f"{start[:4]}" if end != 'max' else f"{start[:4]} and later"
+    return entry.RefinementName or entry.RefinementValue or ''
+
+class RequestTimer:
+    """Time spent inside one query's own search requests, excluding throttle waits."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float, rows: int = 0):
+        with self._lock:
+            self.seconds += seconds
+            self.rows += rows
+
 class SharePointScanner:
-    def __init__(self, ctx: ClientContext, auth_type: str = 'user_pass'):
+    def __init__(
+        self,
+        ctx: ClientContext,
+        auth_type: str = 'user_pass',
+        context_factory: Optional[Callable[[], ClientContext]] = None,
+        max_workers: int = SEARCH_WORKERS
+    ):
         self.ctx = ctx
         self.ctx.pending_request().beforeExecute += self._disable_ssl
         self.auth_type = auth_type
         self.last_request_time = 0
         # Set rate limit based on auth type
         self.request_limit = 0.1 if auth_type == 'user_pass' else 0.04  # 10 req/s or 25 req/s
+        # A ClientContext query queue is not thread-safe, so each request checks one
+        # out of a pool; contexts stay authenticated and are reused across queries
+        self.context_factory = context_factory
+        self.max_workers = max_workers
+        self._contexts: Queue = Queue()
+        self._contexts.put(ctx)
+        self._context_count = 1
+        self._context_lock = threading.Lock()
+        self._throttle_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
 
     @staticmethod
     def _disable_ssl(request):
         """Disable SSL verification for the request."""
         request.verify = False
 
+    @contextmanager
+    def _context(self) -> Iterator[ClientContext]:
+        """Check out a ClientContext for one request, creating one if the pool allows."""
+        try:
+            ctx = self._contexts.get_nowait()
+        except Empty:
+            with self._context_lock:
+                # Pool workers plus the calling thread can have a request in flight
+                create = self.context_factory is not None and self._context_count <= self.max_workers
+                if create:
+                    self._context_count += 1
+            if create:
+                ctx = self.context_factory()
+                ctx.pending_request().beforeExecute += self._disable_ssl
+            else:
+                ctx = self._contexts.get()
+        try:
+            yield ctx
+        finally:
+            self._contexts.put(ctx)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Shared pool for search requests, reused by every query and planning step.
+
+        Only leaf tasks (single requests or one query's paging) are submitted, so
+        callers waiting on the pool never occupy its workers.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _post_query(self, search_query: str, row_limit: int, timer: Optional[RequestTimer] = None, **kwargs):
+        """Send one throttled postquery request and return its PrimaryQueryResult."""
+        self._throttle_request()
+        with self._context() as ctx:
+            started = time.perf_counter()
+            result = (ctx.search
+                    .post_query(query_text=search_query, row_limit=row_limit, **kwargs)
+                    .execute_query()
+                    .value
+                    .PrimaryQueryResult)
+        if timer is not None:
+            timer.add(time.perf_counter() - started, len(result.RelevantResults.Table.Rows))
+        return result
+
     def _throttle_request(self):
         """Implement request throttling based on auth type."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.request_limit:
-            time.sleep(self.request_limit - time_since_last)
-        self.last_request_time = time.time()
+        with self._throttle_lock:
+            current_time = time.time()
+            time_since_last = current_time - self.last_request_time
+            if time_since_last < self.request_limit:
+                time.sleep(self.request_limit - time_since_last)
+            self.last_request_time = time.time()
 
     def get_keywords(self, keywords_file: str = 'config/keywords.txt') -> List[str]:
         """Load keywords from a file."""
@@ -104,56 +350,230 @@ class SharePointScanner:
             logging.error(f"Error creating custom query: {e}")
             raise
 
+    def _iter_search_pages(
+        self,
+        search_query: str,
+        row_limit: int = 500,
+        timer: Optional[RequestTimer] = None
+    ) -> Iterator[List[str]]:
+        """Page through a search query, yielding the paths of each page."""
+        start_row = 0
+        while True:
+            try:
+                results = self._post_query(search_query, row_limit, timer, start_row=start_row).RelevantResults
+
+                rows = results.Table.Rows
+                if not rows:
+                    return
+                yield [row.Cells["Path"] for row in rows]
+                start_row += row_limit
+            except Exception as e:
+                logging.error(f"Error during search at row {start_row}: {e}")
+                return
+
     def search_files(
         self, 
         query: str, 
         extensions: Optional[List[str]] = None, 
         last_modified: Optional[str] = None,
         row_limit: int = 500
-    ) -> List[str]:
+    ) -> UrlStore:
         """Search for files in SharePoint based on given criteria."""
-        files: Set[str] = set()
-        start_row = 0
-        more_results = True
+        files = UrlStore()
         total_processed = 0
+        search_query = build_search_query(query, extensions, last_modified)
 
         with console.status("[bold green]Searching SharePoint...") as status:
-            while more_results:
-                try:
-                    # Apply throttling
-                    self._throttle_request()
-                    
-                    # Build search query
-                    search_query = query
-                    if extensions:
-                        ext_query = f" AND ({' OR '.join([f'FileExtension:{ext}' for ext in extensions])})"
-                        search_query += ext_query
-                    if last_modified:
-                        search_query += f" AND {last_modified}"
-                    
-                    results = (self.ctx.search
-                             .post_query(query_text=search_query, row_limit=row_limit, start_row=start_row)
-                             .execute_query()
-                             .value
-                             .PrimaryQueryResult
-                             .RelevantResults)
-                    
-                    result_count = len(results.Table.Rows)
-                    if result_count > 0:
-                        for row in results.Table.Rows:
-                            files.add(row.Cells["Path"])
-                        total_processed += result_count
-                        status.update(f"[bold green]Found {total_processed} files...")
-                        start_row += row_limit
-                    else:
-                        more_results = False
-                        
-                except Exception as e:
-                    logging.error(f"Error during search at row {start_row}: {e}")
-                    break
+            for page in self._iter_search_pages(search_query, row_limit):
+                files.update(page)
+                total_processed += len(page)
+                status.update(f"[bold green]Found {total_processed} files...")
 
         logging.info(f"Search completed. Found {len(files)} unique files")
-        return list(files)
+        return files
+
+    async def asearch(
+        self,
+        query: str,
+        extensions: Optional[List[str]] = None,
+        last_modified: Optional[str] = None,
+        row_limit: int = 500,
+        max_concurrency: int = 100
+    ) -> AsyncIterator[Dict[str, str]]:
+        """Search asynchronously, yielding each result row as a {property: value} dict.
+
+        Usage: ``async for row in scanner.asearch(query): row["Path"]``
+        """
+        search_query = build_search_query(query, extensions, last_modified)
+        async with AsyncSearchClient(self.ctx, self.request_limit, max_concurrency) as client:
+            async for row in client.search(search_query, row_limit, max_rows=SEARCH_PAGING_CAP):
+                yield row
+
+    def count_rows(self, search_query: str, timer: Optional[RequestTimer] = None) -> int:
+        """Return the TotalRows the search service reports for a query."""
+        return self._post_query(search_query, 0, timer).RelevantResults.TotalRows or 0
+
+    def plan_date_windows(
+        self,
+        search_query: str,
+        start: Optional[date],
+        end: Optional[date],
+        total_rows: Optional[int] = None,
+        paging_cap: int = SEARCH_PAGING_CAP,
+        timer: Optional[RequestTimer] = None
+    ) -> List[DateWindow]:
+        """Split [start, end) until every window's TotalRows fits under the paging cap.
+
+        A query that already fits is returned as one unbounded window. Failed
+        window counts raise, so callers can fall back to a single paged query.
+        """
+        if total_rows is None:
+            total_rows = self.count_rows(window_query(search_query, (start, end)), timer)
+        if total_rows <= paging_cap:
+            return [(start, end)]
+
+        # Bisect a bounded core range, with open-ended windows covering the rest
+        low = start or PARTITION_START
+        high = end or date.today() + timedelta(days=1)
+        pending: List[DateWindow] = [(low, high)]
+        if start is None:
+            pending.append((None, low))
+        if end is None:
+            pending.append((high, None))
+
+        windows: List[DateWindow] = []
+        planned_rows = 0
+        while pending:
+            counts = list(self.executor.map(lambda w: self.count_rows(window_query(search_query, w), timer), pending))
+            next_pending = []
+            for window, window_rows in zip(pending, counts):
+                if window_rows == 0:
+                    continue
+                halves = split_window(window) if window_rows > paging_cap else None
+                if halves is None:
+                    if window_rows > paging_cap:
+                        logging.warning(f"{window_rows} results on {window[0]} exceed the paging cap, "
+                                        f"only the first {paging_cap} can be retrieved")
+                    windows.append(window)
+                    planned_rows += window_rows
+                else:
+                    next_pending += halves
+            pending = next_pending
+
+        # The windows cover the whole range, so a gap only reflects approximate TotalRows
+        if abs(planned_rows - total_rows) > total_rows * TOTAL_ROWS_TOLERANCE:
+            logging.warning(f"Date windows count {planned_rows} results but the query reports {total_rows}")
+        else:
+            logging.debug(f"Date windows count {planned_rows} results, the query reports {total_rows}")
+
+        windows.sort(key=lambda w: w[0] or date.min)
+        logging.info(f"Partitioned query into {len(windows)} date windows")
+        return windows
+
+    def search_files_partitioned(
+        self,
+        query: str,
+        extensions: Optional[List[str]] = None,
+        last_modified: Optional[str] = None,
+        row_limit: int = 500,
+        show_status: bool = True,
+        total_rows: Optional[int] = None,
+        timer: Optional[RequestTimer] = None
+    ) -> UrlStore:
+        """Search across disjoint LastModifiedTime windows so no results fall past the paging cap.
+
+        A known TotalRows for the query (e.g. from a pre-flight count) saves
+        the planner from counting the full range again.
+        """
+        search_query = build_search_query(query, extensions, last_modified)
+        start, end = get_partition_range(query, last_modified)
+        try:
+            with console.status("[bold green]Partitioning search by date...") if show_status else nullcontext():
+                windows = self.plan_date_windows(search_query, start, end, total_rows, timer=timer)
+        except Exception as e:
+            logging.error(f"Error partitioning search, falling back to a single query: {e}")
+            windows = [(None, None)]
+
+        queries = [window_query(search_query, window) for window in windows]
+        return self.search_queries(queries, row_limit, show_status, timer)
+
+    def estimate_query_costs(
+        self,
+        queries: Dict[str, str],
+        history: Dict[str, Dict],
+        row_limit: int = 500
+    ) -> Dict[str, Tuple[Optional[int], float]]:
+        """Pre-flight each query for TotalRows and estimate its run time in seconds.
+
+        The estimate scales the query's recorded seconds per row when its text is
+        unchanged since the last run, and falls back to a per-page default.
+        """
+        def _estimate(title: str) -> Tuple[Optional[int], float]:
+            query = queries[title]
+            timer = RequestTimer()
+            try:
+                total_rows = self.count_rows(query, timer)
+            except Exception as e:
+                logging.error(f"Error estimating cost of query {title}: {e}")
+                return None, float('inf')
+            elapsed = timer.seconds
+
+            past = history.get(title)
+            if past and past.get('query') == query and past.get('seconds_per_row'):
+                return total_rows, total_rows * past['seconds_per_row']
+            pages = -(-total_rows // row_limit)
+            return total_rows, pages * max(elapsed, DEFAULT_SECONDS_PER_PAGE)
+
+        return dict(zip(queries, self.executor.map(_estimate, queries)))
+
+    def summarize_query(self, query: str) -> Dict[str, Dict[str, int]]:
+        """Count a query's hits by site, file extension and year using refiners only."""
+        refiners = [
+            year_refiner() if r == 'LastModifiedTime' else f"{r}(filter={SUMMARY_MAX_ENTRIES}/0/*)"
+            for r in SUMMARY_REFINERS
+        ]
+        result = self._post_query(query, 0, refiners=','.join(refiners))
+
+        summary: Dict[str, Dict[str, int]] = {'Total': {'': result.RelevantResults.TotalRows or 0}}
+        for refiner in result.RefinementResults.Refiners:
+            summary[refiner.Name] = {
+                refinement_label(refiner.Name, entry): int(entry.RefinementCount)
+                for entry in refiner.Entries
+            }
+        # Recorded so the CSV shows which breakdowns were truncated
+        capped = {refiner: len(entries) for refiner, entries in summary.items() if len(entries) >= SUMMARY_MAX_ENTRIES}
+        if capped:
+            logging.warning(f"Refiners capped at {SUMMARY_MAX_ENTRIES} entries, counts are incomplete: {', '.join(capped)}")
+            summary['Capped'] = capped
+        return summary
+
+    def search_queries(
+        self,
+        queries: List[str],
+        row_limit: int = 500,
+        show_status: bool = True,
+        timer: Optional[RequestTimer] = None
+    ) -> UrlStore:
+        """Run complete KQL queries concurrently and merge their unique paths."""
+        files = UrlStore()
+        files_lock = threading.Lock()
+
+        def _collect(search_query: str):
+            # Merge page by page so no query holds its full result list
+            for page in self._iter_search_pages(search_query, row_limit, timer):
+                with files_lock:
+                    files.update(page)
+
+        # Worker threads of an outer scheduler cannot open their own live status
+        with console.status("[bold green]Searching SharePoint...") if show_status else nullcontext() as status:
+            futures = [self.executor.submit(_collect, q) for q in queries]
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                if status:
+                    status.update(f"[bold green]Completed {done}/{len(queries)} queries, found {len(files)} files...")
+
+        logging.info(f"Search completed. Found {len(files)} unique files across {len(queries)} queries")
+        return files
 
 def get_search_type() -> str:
     """Get search type from user."""
@@ -161,17 +581,19 @@ def get_search_type() -> str:
     console.print("1. Use predefined queries (recommended)")
     console.print("2. Use predefined keywords from keywords.txt")
     console.print("3. Enter custom keywords and logic")
+    console.print("4. Exposure summary of predefined queries (counts only)")
     
     search_type = Prompt.ask(
         "\nChoose search type",
-        choices=["1", "2", "3"],
+        choices=["1", "2", "3", "4"],
         default="1"
     )
 
     return {
         "1": "predefined_queries",
         "2": "predefined",
-        "3": "custom"
+        "3": "custom",
+        "4": "summary"
     }[search_type]
 
 def get_file_extensions() -> List[str]:
@@ -227,7 +649,7 @@ def get_date_range() -> str:
         console.print("[red]Invalid date format. Using default 'this year'[/red]")
         return 'LastModifiedTime="this year"'
 
-def save_results(files: List[str], output_file: str, query_title: Optional[str] = None):
+def save_results(files: Iterable[str], output_file: str, query_title: Optional[str] = None):
     """Save search results to file."""
     with open(output_file, 'a', encoding='utf-8') as f:
         if query_title:
@@ -238,6 +660,189 @@ def save_results(files: List[str], output_file: str, query_title: Optional[str]
         if query_title:
             f.write("\n")
 
+def save_summary(summaries: Dict[str, Dict[str, Dict[str, int]]], output_file: str):
+    """Save exposure summary counts to a CSV file."""
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['query', 'refiner', 'value', 'count'])
+        for title, summary in summaries.items():
+            for refiner, entries in summary.items():
+                for value, count in entries.items():
+                    writer.writerow([title, refiner, value, count])
+
+def print_summary(summaries: Dict[str, Dict[str, Dict[str, int]]]):
+    """Print one row per query with its total and top sites, extensions and years."""
+    table = Table(title="Exposure Summary")
+    table.add_column("Query", style="cyan")
+    table.add_column("Hits", justify="right")
+    table.add_column(f"Sites (max {SUMMARY_MAX_ENTRIES})", justify="right")
+    table.add_column("Top extensions")
+    table.add_column("By year")
+
+    for title, summary in summaries.items():
+        extensions = sorted(summary.get('FileExtension', {}).items(), key=lambda e: e[1], reverse=True)[:3]
+        years = sorted(summary.get('LastModifiedTime', {}).items())
+        sites = len(summary.get('SPSiteURL', {}))
+        table.add_row(
+            title,
+            str(summary['Total']['']),
+            str(sites) if sites < SUMMARY_MAX_ENTRIES else f"{SUMMARY_MAX_ENTRIES}+",
+            ", ".join(f"{ext} ({count})" for ext, count in extensions),
+            ", ".join(f"{year}: {count}" for year, count in years if count)
+        )
+    console.print(table)
+
+def load_cost_history(history_file: str = COST_HISTORY_FILE) -> Dict[str, Dict]:
+    """Load per-query cost history recorded by previous runs."""
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.error(f"Error loading query cost history from {history_file}: {e}")
+        return {}
+
+def save_cost_history(history: Dict[str, Dict], history_file: str = COST_HISTORY_FILE):
+    """Persist per-query cost history for the next run."""
+    os.makedirs(os.path.dirname(history_file), exist_ok=True)
+    with open(history_file, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+
+def record_query_cost(history: Dict[str, Dict], title: str, query: str, total_rows: int, seconds: float):
+    """Update a query's history with the seconds per row of its latest run.
+
+    `seconds` is the time spent in the query's own requests and `total_rows` the
+    rows they returned, so concurrent queries and throttling do not skew it.
+    """
+    history[title] = {
+        'query': query,
+        'total_rows': total_rows,
+        'seconds': round(seconds, 3),
+        'seconds_per_row': seconds / total_rows if total_rows else 0,
+        'updated': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def schedule_queries(estimates: Dict[str, Tuple[Optional[int], float]]) -> List[str]:
+    """Order queries largest estimated cost first, dropping those with no hits."""
+    runnable = [title for title, (total_rows, _) in estimates.items() if total_rows != 0]
+    return sorted(runnable, key=lambda title: estimates[title][1], reverse=True)
+
+def run_predefined_queries(
+    scanner: SharePointScanner,
+    queries: Dict[str, str],
+    output_file: str,
+    queue: Optional[WorkQueue] = None
+):
+    """Run predefined queries largest-first across workers, skipping zero-hit queries.
+
+    Run locally, results are written in the order of the queries file; a query
+    that finishes early is held until the ones before it are written. With a
+    shared work queue, the first worker estimates and enqueues the queries and
+    every worker leases them until the queue is drained. Each query's results
+    are then written as soon as it finishes, before it is marked done, so a
+    worker that dies never loses completed queries.
+    """
+    history = load_cost_history()
+    estimates: Dict[str, Tuple[Optional[int], float]] = {}
+    scheduled: List[str] = []
+    skipped: List[str] = []
+    if queue is None or not queue.counts():
+        with console.status("[bold green]Estimating query costs..."):
+            estimates = scanner.estimate_query_costs(queries, history)
+
+        scheduled = schedule_queries(estimates)
+        skipped = [title for title in queries if title not in scheduled]
+        for title in skipped:
+            console.print(f"[yellow]Skipping query with no results: {title}[/yellow]")
+            logging.info(f"Skipping predefined query with no results: {title}")
+        if queue is not None:
+            queue.enqueue(scheduled, {title: estimates[title][1] for title in scheduled})
+
+    local_queue = iter(scheduled)
+
+    def _next_query() -> Optional[Tuple[Optional[int], str]]:
+        if queue is None:
+            title = next(local_queue, None)
+            return (None, title) if title else None
+        leased = queue.lease()
+        return leased[0] if leased else None
+
+    def _run(title: str) -> Tuple[UrlStore, RequestTimer]:
+        timer = RequestTimer()
+        total_rows = estimates.get(title, (None, 0))[0]
+        files = scanner.search_files_partitioned(queries[title], show_status=False, total_rows=total_rows, timer=timer)
+        return files, timer
+
+    # Finished local results waiting for their turn in the output file, None for nothing to write
+    finished: Dict[str, Optional[UrlStore]] = {title: None for title in skipped}
+    order = list(queries)
+    next_index = 0
+
+    def _write_finished(final: bool = False):
+        nonlocal next_index
+        while next_index < len(order):
+            title = order[next_index]
+            if title in finished:
+                files = finished.pop(title)
+                if files is not None:
+                    save_results(files, output_file, title)
+            elif not final:
+                # Not finished yet, or run by another worker
+                return
+            next_index += 1
+
+    # Renew in-flight leases well before they expire, however long a query runs
+    heartbeat = queue.lease_seconds / 3 if queue is not None else None
+    completed = 0
+    try:
+        with console.status("[bold green]Running queries...") as status, ThreadPoolExecutor(max_workers=scanner.max_workers) as executor:
+            in_flight = {}
+            while True:
+                while len(in_flight) < scanner.max_workers:
+                    lease = _next_query()
+                    if lease is None:
+                        break
+                    item_id, title = lease
+                    in_flight[executor.submit(_run, title)] = (item_id, title)
+
+                if not in_flight:
+                    # Other workers may die holding leases, wait for them to expire or finish
+                    if queue is not None and queue.counts().get('leased'):
+                        time.sleep(POLL_INTERVAL)
+                        continue
+                    break
+
+                done, _ = wait(in_flight, timeout=heartbeat, return_when=FIRST_COMPLETED)
+                if queue is not None:
+                    queue.renew(item_id for future, (item_id, _) in in_flight.items() if future not in done)
+                for future in done:
+                    item_id, title = in_flight.pop(future)
+                    try:
+                        files, timer = future.result()
+                    except Exception as e:
+                        logging.error(f"Error running query {title}: {e}")
+                        console.print(f"[red]Error running query {title}: {e}[/red]")
+                        if queue is not None:
+                            queue.fail(item_id, str(e))
+                        finished[title] = None
+                        continue
+                    record_query_cost(history, title, queries[title], timer.rows, timer.seconds)
+                    if queue is not None:
+                        # Only mark the query done once its results are on disk
+                        save_results(files, output_file, title)
+                        queue.complete(item_id, str(len(files)))
+                    else:
+                        finished[title] = files
+                    completed += 1
+                    console.print(f"[yellow]Completed query: {title}[/yellow] ({len(files)} files, {timer.seconds:.1f}s in requests)")
+                    status.update(f"[bold green]Completed {completed} queries...")
+                _write_finished()
+    finally:
+        # Keep whatever finished locally even if the run is interrupted
+        _write_finished(final=True)
+        save_cost_history(history)
+
 def main(auth_info: Tuple):
     # Display banner
     console.print(Panel.fit(
@@ -246,29 +851,26 @@ def main(auth_info: Tuple):
         border_style="blue"
     ))
 
+    scanner = None
     try:
         # Initialize SharePoint context
-        auth_type, *auth_details = auth_info
-        if auth_type == 'user_pass':
-            _, username, password, url = auth_info
-            ctx = ClientContext(url).with_credentials(UserCredential(username, password))
-        else:  # Azure app auth
-            _, cert_settings, tenant, url = auth_info
-            ctx = ClientContext(url).with_client_certificate(tenant, **cert_settings)
+        auth_type = auth_info[0]
+        ctx = create_context(auth_info)
 
-        scanner = SharePointScanner(ctx, auth_type)
+        scanner = SharePointScanner(ctx, auth_type, context_factory=lambda: create_context(auth_info))
 
         # Get search type first
         search_type = get_search_type()
 
         # Get output file path
         console.print("\n[cyan]Output File:[/cyan]")
-        console.print("Press Enter to use default output_search.txt")
+        default_output = "output/exposure_summary.csv" if search_type == "summary" else "output/output_search.txt"
+        console.print(f"Press Enter to use default {os.path.basename(default_output)}")
         console.print("Or specify custom output file path")
         
         output_file = Prompt.ask(
             "Enter output file path",
-            default="output/output_search.txt"
+            default=default_output
         )
 
         # Ensure output directory exists
@@ -284,11 +886,44 @@ def main(auth_info: Tuple):
             if not queries:
                 raise ValueError("No predefined queries found")
 
+            console.print("\n[cyan]Work Queue:[/cyan]")
+            console.print("Press Enter to run all queries on this host")
+            console.print("Or specify a shared queue file to split the queries with other workers")
+            queue_path = Prompt.ask("Enter shared work queue path", default="", show_default=False)
+            queue = None
+            if queue_path:
+                run_id = Prompt.ask("Enter the run id shared by all workers of this run", default=default_run_id())
+                queue = WorkQueue(queue_path, 'predefined_queries', SEARCH_LEASE_SECONDS, run_id)
+                if queue.drained():
+                    console.print(f"[yellow]Run {run_id} on {queue_path} has already finished ({queue.counts()}). "
+                                  f"Enter a new run id to start another run.[/yellow]")
+                    queue.close()
+                    return
+
             console.print("\n[cyan]Running predefined queries...[/cyan]")
-            for title, query in queries.items():
-                console.print(f"\n[yellow]Running query: {title}[/yellow]")
-                files = scanner.search_files(query)
-                save_results(files, output_file, title)
+            try:
+                run_predefined_queries(scanner, queries, output_file, queue)
+            finally:
+                if queue is not None:
+                    logging.info(f"Work queue {queue_path} status: {queue.counts()}")
+                    queue.close()
+
+        elif search_type == "summary":
+            queries = scanner.get_predefined_queries()
+            if not queries:
+                raise ValueError("No predefined queries found")
+
+            summaries = {}
+            with console.status("[bold green]Summarizing predefined queries...") as status:
+                for title, query in queries.items():
+                    status.update(f"[bold green]Summarizing: {title}")
+                    try:
+                        summaries[title] = scanner.summarize_query(query)
+                    except Exception as e:
+                        logging.error(f"Error summarizing query {title}: {e}")
+                        console.print(f"[red]Error summarizing query {title}: {e}[/red]")
+            print_summary(summaries)
+            save_summary(summaries, output_file)
                 
         else:
             # Get file extensions and date range for other search types
@@ -309,14 +944,18 @@ def main(auth_info: Tuple):
                 keywords = scanner.get_keywords(keywords_file)
                 if not keywords:
                     raise ValueError("No keywords found in the specified file")
-                query = " OR ".join(f'"{k}"' for k in keywords)
-                console.print(f"\n[green]Using {len(keywords)} keywords from file[/green]")
+                queries = plan_keyword_queries(keywords, extensions, last_modified)
+                console.print(f"\n[green]Using {len(keywords)} keywords from file in {len(queries)} queries[/green]")
+
+                # Perform search
+                console.print("\n[cyan]Searching SharePoint...[/cyan]")
+                files = scanner.search_queries(queries)
             else:  # custom
                 query = scanner.custom_query()
 
-            # Perform search
-            console.print("\n[cyan]Searching SharePoint...[/cyan]")
-            files = scanner.search_files(query, extensions, last_modified)
+                # Perform search
+                console.print("\n[cyan]Searching SharePoint...[/cyan]")
+                files = scanner.search_files(query, extensions, last_modified)
             save_results(files, output_file)
 
         console.print(f"\n[green]✓[/green] Search completed. Results saved to: {output_file}")
@@ -326,6 +965,9 @@ def main(auth_info: Tuple):
         logging.error(f"Error in main execution: {e}")
         console.print(f"[red]Error: {str(e)}[/red]")
         return
+    finally:
+        if scanner is not None:
+            scanner.close()
 
 if __name__ == "__main__":
     console.print("[yellow]This script should be run from the main.py file.[/yellow]")
\ No newline at end of file
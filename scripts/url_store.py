@@ -0,0 +1,113 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Path segments kept in the interned prefix, e.g. /sites/<site>/<library>/
+PREFIX_SEGMENTS = 3
+EMPTY_SLOT = -1
+
+def split_url(url: str) -> Tuple[str, str]:
+    """Split a URL into its shared site/library prefix and the remaining suffix."""
+    scheme_end = url.find('://')
+    path_start = url.find('/', scheme_end + 3 if scheme_end != -1 else 0)
+    if path_start == -1:
+        return url, ''
+
+    # Never swallow the last segment, so site URLs still share /sites/
+    segments = url.count('/', path_start + 1)
+    cut = path_start
+    for _ in range(min(segments, PREFIX_SEGMENTS)):
+        cut = url.index('/', cut + 1)
+    return url[:cut + 1], url[cut + 1:]
+
+class UrlStore:
+    """Insertion-ordered set of URLs with interned prefixes.
+
+    Site and library prefixes are stored once; suffixes live in a single UTF-8
+    buffer indexed by array offsets, and membership uses an open-addressing
+    table of entry indices instead of per-URL Python strings.
+    """
+
+    def __init__(self, urls: Optional[Iterable[str]] = None):
+        self._prefixes: List[str] = []
+        self._prefix_ids: Dict[str, int] = {}
+        self._buffer = bytearray()
+        self._offsets = array('Q', [0])
+        self._prefix_of = array('I')
+        self._hashes = array('q')
+        self._slots = array('q', [EMPTY_SLOT]) * 8
+        if urls is not None:
+            self.update(urls)
+
+    def __len__(self) -> int:
+        return len(self._prefix_of)
+
+    def __contains__(self, url: object) -> bool:
+        if not isinstance(url, str):
+            return False
+        prefix, suffix = split_url(url)
+        prefix_id = self._prefix_ids.get(prefix)
+        if prefix_id is None:
+            return False
+        return self._slots[self._find_slot(hash(url), prefix_id, suffix.encode('utf-8'))] != EMPTY_SLOT
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        suffix = self._buffer[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+        return self._prefixes[self._prefix_of[index]] + suffix
+
+    def add(self, url: str) -> bool:
+        """Add a URL, returning False if it was already stored."""
+        prefix, suffix = split_url(url)
+        prefix_id = self._prefix_ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = len(self._prefixes)
+            self._prefixes.append(prefix)
+            self._prefix_ids[prefix] = prefix_id
+
+        url_hash = hash(url)
+        encoded = suffix.encode('utf-8')
+        slot = self._find_slot(url_hash, prefix_id, encoded)
+        if self._slots[slot] != EMPTY_SLOT:
+            return False
+
+        self._slots[slot] = len(self)
+        self._buffer += encoded
+        self._offsets.append(len(self._buffer))
+        self._prefix_of.append(prefix_id)
+        self._hashes.append(url_hash)
+        # Keep the table at most half full so probe chains stay short
+        if len(self) * 2 > len(self._slots):
+            self._resize(len(self._slots) * 2)
+        return True
+
+    def update(self, urls: Iterable[str]) -> int:
+        """Add several URLs, returning how many were new."""
+        return sum(1 for url in urls if self.add(url))
+
+    def _find_slot(self, url_hash: int, prefix_id: int, encoded: bytes) -> int:
+        """Return the slot holding this URL, or the empty slot where it belongs."""
+        mask = len(self._slots) - 1
+        slot = url_hash & mask
+        while True:
+            index = self._slots[slot]
+            if index == EMPTY_SLOT:
+                return slot
+            if (self._hashes[index] == url_hash
+                    and self._prefix_of[index] == prefix_id
+                    and self._buffer[self._offsets[index]:self._offsets[index + 1]] == encoded):
+                return slot
+            slot = (slot + 1) & mask
+
+    def _resize(self, size: int):
+        self._slots = array('q', [EMPTY_SLOT]) * size
+        mask = size - 1
+        for index, url_hash in enumerate(self._hashes):
+            slot = url_hash & mask
+            while self._slots[slot] != EMPTY_SLOT:
+                slot = (slot + 1) & mask
+            self._slots[slot] = index
@@ -0,0 +1,164 @@
+import logging
+import os
+import socket
+import sqlite3
+import time
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    item TEXT NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    UNIQUE (queue, item)
+);
+CREATE INDEX IF NOT EXISTS work_items_lease ON work_items (queue, status, priority DESC, id);
+"""
+
+def worker_id() -> str:
+    """Identify this worker process across hosts."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def default_run_id() -> str:
+    """Run id suggested to workers, so workers started the same day share a run."""
+    return date.today().isoformat()
+
+class WorkQueue:
+    """Leased work queue in a SQLite file shared by worker processes or hosts.
+
+    Items are leased with an expiry; leases that run out (e.g. a worker died)
+    make the item available again until it has been attempted MAX_ATTEMPTS times.
+    Each run id is a separate queue, so a file can be reused for later runs.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        queue: str,
+        lease_seconds: int = DEFAULT_LEASE_SECONDS,
+        run_id: Optional[str] = None
+    ):
+        self.path = path
+        self.queue = f"{queue}/{run_id}" if run_id else queue
+        self.lease_seconds = lease_seconds
+        self.worker = worker_id()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Autocommit mode, transactions are opened explicitly where needed
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, items: Iterable[str], priorities: Optional[Dict[str, float]] = None) -> int:
+        """Add items not already in the queue, returning how many were new."""
+        priorities = priorities or {}
+        rows = [(self.queue, item, priorities.get(item, 0)) for item in items]
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO work_items (queue, item, priority) VALUES (?, ?, ?)", rows
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        logging.info(f"Queued {added} new items on {self.queue} ({len(rows) - added} already present)")
+        return added
+
+    def lease(self, count: int = 1) -> List[Tuple[int, str]]:
+        """Lease up to `count` pending or expired items, highest priority first."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Leases that ran out past the last attempt are given up on
+            self.conn.execute(
+                "UPDATE work_items SET status = 'failed', error = 'lease expired' "
+                "WHERE queue = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (self.queue, now, MAX_ATTEMPTS)
+            )
+            rows = self.conn.execute(
+                "SELECT id, item FROM work_items WHERE queue = ? "
+                "AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                "ORDER BY priority DESC, id LIMIT ?",
+                (self.queue, now, count)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE work_items SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                [(self.worker, now + self.lease_seconds, item_id) for item_id, _ in rows]
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def renew(self, item_ids: Iterable[int]):
+        """Extend this worker's leases on items still being worked on."""
+        self.conn.executemany(
+            "UPDATE work_items SET lease_expires = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            [(time.time() + self.lease_seconds, item_id, self.worker) for item_id in item_ids]
+        )
+
+    def _finish(self, item_id: int, status: str, result: Optional[str] = None, error: Optional[str] = None):
+        self.conn.execute(
+            "UPDATE work_items SET status = ?, result = ?, error = ?, lease_expires = NULL "
+            "WHERE id = ? AND lease_owner = ?",
+            (status, result, error, item_id, self.worker)
+        )
+
+    def complete(self, item_id: int, result: Optional[str] = None):
+        """Mark a leased item as done."""
+        self._finish(item_id, 'done', result=result)
+
+    def fail(self, item_id: int, error: str):
+        """Release a leased item for retry, or mark it failed after MAX_ATTEMPTS."""
+        attempts = self.conn.execute("SELECT attempts FROM work_items WHERE id = ?", (item_id,)).fetchone()
+        if attempts and attempts[0] >= MAX_ATTEMPTS:
+            self._finish(item_id, 'failed', error=error)
+        else:
+            self._finish(item_id, 'pending', error=error)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of items in each status."""
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) FROM work_items WHERE queue = ? GROUP BY status", (self.queue,)
+        ).fetchall()
+        return dict(rows)
+
+    def drained(self) -> bool:
+        """True if this run already has items and none are left pending or leased."""
+        counts = self.counts()
+        return bool(counts) and not counts.get('pending') and not counts.get('leased')
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        """Lease items one at a time until the queue is drained.
+
+        While other workers still hold leases this polls, so items from a worker
+        that dies are picked up once its lease expires.
+        """
+        while True:
+            leased = self.lease()
+            if leased:
+                yield leased[0]
+            elif self.counts().get('leased'):
+                time.sleep(POLL_INTERVAL)
+            else:
+                return